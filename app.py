@@ -1,9 +1,20 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
 import os
+import uuid
+from functools import partial
+
+import perf
+from comparison import UNITS_PER_PAGE, comparison_table_html, page_count
+from fleet_data import (
+    WORKBOOK_PATH, SaveConflictError, current_fleet, edit_state_hash, export_workbook, save_and_publish, start_watcher,
+)
+from pricing import (
+    COST_PER_KM, COST_PER_MONTH, ESTIMATED_KM, EXCESS_KM_CHARGE, EXCESS_KM_COST, KILO_METERS, TOTAL_COST,
+    UPDATED_COLUMNS, numeric_column, price_rows, sweep_cost_per_month, sweep_fleet_cost_per_month,
+)
+from unit_search import VEHICLE_TYPES
 
 # Set page config
 st.set_page_config(
@@ -14,10 +25,13 @@ st.set_page_config(
 
 # Title
 st.title("📊 Excel Data Comparison Dashboard")
-st.markdown("Compare up to 3 rows from your Excel data")
+st.markdown("Compare any number of rows from your Excel data")
 
 # Load Excel file from directory
-excel_file_path = "trailer.xlsx"  # Replace with your actual file name
+excel_file_path = WORKBOOK_PATH  # Set TRAILER_WORKBOOK to use a different file, or a directory of vendor quotes
+
+# A directory is merged from all of its workbooks and sheets, and can't be saved back
+quote_directory_mode = os.path.isdir(excel_file_path)
 
 # Check if file exists
 if not os.path.exists(excel_file_path):
@@ -33,372 +47,263 @@ if 'editable_data' not in st.session_state:
 if 'data_refresh_needed' not in st.session_state:
     st.session_state.data_refresh_needed = False
 
+
+def save_changes(fleet, row_updates):
+    """Save button callback; runs before the rerun, which then shows the published data."""
+    # File versions the edited units were read from, for save conflict checks
+    base_signatures = {st.session_state.editable_data[key]['base_signature'] for key, _ in row_updates}
+    try:
+        if len(base_signatures) > 1:
+            raise SaveConflictError(
+                f"'{os.path.basename(excel_file_path)}' was changed by someone else while you were editing"
+            )
+        # Patch only the edited cells, failing if another session saved first, and share
+        # the saved values with every session without re-reading the file
+        published = save_and_publish(fleet, row_updates, expected_signature=base_signatures.pop())
+    except SaveConflictError as e:
+        st.session_state.save_message = ("error", f"❌ {str(e)}. Reload the page to pick up the latest data before saving again.")
+        return
+    except Exception as e:
+        st.session_state.save_message = ("error", f"❌ Error saving to Excel: {str(e)}")
+        return
+    
+    st.session_state.save_message = ("success", "✅ Changes saved successfully to Excel file!")
+    st.session_state.seen_version = published.version
+    
+    # Start the next edits from the saved values
+    st.session_state.editable_data = {}
+    for key in [key for key in st.session_state if str(key).startswith("edits_")]:
+        del st.session_state[key]
+    st.session_state.data_refresh_needed = True
+
+
+# Opt-in per-phase timing of this rerun (enabled by TRAILER_PERF_LOG)
+if 'perf_session_id' not in st.session_state:
+    st.session_state.perf_session_id = uuid.uuid4().hex
+timer = perf.RerunTimer(st.session_state.perf_session_id)
+rows_loaded = 0
+selections = []
+
 # Load the file automatically
 try:
-    # Read Excel file from directory
-    df = pd.read_excel(excel_file_path)
+    # Latest parsed version of the file; a background watcher reloads it when it changes
+    start_watcher(excel_file_path)
+    fleet = current_fleet(excel_file_path)
+    df = fleet.frame
+    rows_loaded = len(df)
+    timer.lap("load")
     
-    # Get the first column name and unique values
-    first_column = df.columns[0]
-    unique_values = df[first_column].unique().tolist()
+    # Tell the user when the data changed since their last rerun
+    seen_version = st.session_state.get('seen_version')
+    if seen_version is not None and seen_version != fleet.version:
+        st.info("🔄 The Excel file was updated, and the latest data is now shown.")
+    st.session_state.seen_version = fleet.version
     
-    st.markdown("---")
-    st.subheader("🔍 Select Items to Compare")
-    
-    # Create three columns for dropdowns
-    col1, col2, col3 = st.columns(3)
+    # Get the key (first) column name
+    first_column = fleet.key_column
     
-    with col1:
-        st.markdown("**First Selection**")
-        selection1 = st.selectbox(
-            f"Choose from {first_column}:",
-            options=["None"] + unique_values,
-            key="select1"
+    if fleet.duplicates:
+        st.warning(
+            f"{len(fleet.duplicates)} value(s) in '{first_column}' appear on more than one row; "
+            f"the first matching row is used for: {', '.join(map(str, fleet.duplicates))}"
         )
     
-    with col2:
-        st.markdown("**Second Selection**")
-        selection2 = st.selectbox(
-            f"Choose from {first_column}:",
-            options=["None"] + unique_values,
-            key="select2"
-        )
+    st.markdown("---")
+    st.subheader("🔍 Select Items to Compare")
     
-    with col3:
-        st.markdown("**Third Selection**")
-        selection3 = st.selectbox(
-            f"Choose from {first_column}:",
-            options=["None"] + unique_values,
-            key="select3"
+    # Search on the server and send only the top matches to the browser
+    search_col, type_col = st.columns([3, 1])
+    with search_col:
+        query = st.text_input(
+            f"Search {first_column}:",
+            key="unit_query",
+            placeholder="Type part of a name, e.g. volvo fh540"
         )
+    with type_col:
+        vehicle_type = st.selectbox("Vehicle type", options=["All"] + VEHICLE_TYPES, key="unit_type")
+    matches, match_count = fleet.search.search(query, None if vehicle_type == "All" else vehicle_type)
     
-    # Filter selected rows
-    selected_data = []
-    selections = [selection1, selection2, selection3]
-    selection_names = ["Selection 1", "Selection 2", "Selection 3"]
+    # Keep units that are already selected available, even when the search no longer matches them
+    current_selections = [s for s in st.session_state.get("selections", []) if s in fleet.index]
+    st.session_state.selections = current_selections
+    options = current_selections + [key for key in matches if key not in current_selections]
     
-    for i, selection in enumerate(selections):
-        if selection != "None":
-            row_data = df[df[first_column] == selection].iloc[0].copy()
-            selected_data.append((selection_names[i], selection, row_data, i))
+    selections = st.multiselect(
+        f"Choose from {first_column}:",
+        options=options,
+        format_func=lambda key: f"{fleet.search.vehicle_type(key)} · {key}",
+        key="selections"
+    )
+    if match_count > len(matches):
+        st.caption(f"Showing the first {len(matches)} of {match_count} matches; refine the search to see more.")
+    timer.lap("search")
     
-    if selected_data:
+    # Edits are only kept while a unit is selected; reselecting it starts from the latest data
+    st.session_state.editable_data = {
+        s: values for s, values in st.session_state.editable_data.items() if s in selections
+    }
+    
+    if selections:
         st.markdown("---")
         
-        # Create editable input fields section
-        st.markdown("Adjust the values below to recalculate costs:")
+        # Selected workbook rows, in selection order
+        selected_frame = df.iloc[[fleet.position(selection) for selection in selections]]
         
-        # Create columns for editable inputs
-        input_cols = st.columns(len(selected_data))
+        # Initialize edits for new selections from the actual Excel values, not default zeros, and
+        # move unedited values on to the latest file version so they can still be saved
+        new_selections = [
+            s for s in selections
+            if s not in st.session_state.editable_data
+            or (not st.session_state.editable_data[s]['edited']
+                and st.session_state.editable_data[s]['base_signature'] != fleet.signature)
+        ]
+        if new_selections:
+            new_frame = df.iloc[[fleet.position(selection) for selection in new_selections]]
+            excel_excess_km_charge = numeric_column(new_frame, EXCESS_KM_CHARGE)
+            excel_estimated_km_per_month = numeric_column(new_frame, ESTIMATED_KM)
+            for i, selection in enumerate(new_selections):
+                st.session_state.editable_data[selection] = {
+                    'excess_km_charge': float(excel_excess_km_charge[i]),
+                    'estimated_km_per_month': float(excel_estimated_km_per_month[i]),
+                    # File version these values were read from
+                    'base_signature': fleet.signature,
+                    'edited': False,
+                }
         
-        for idx, (name, selection, row_data, original_idx) in enumerate(selected_data):
-            with input_cols[idx]:
-                
-                # Initialize session state for this selection if not exists
-                selection_key = f"{selection}_{original_idx}"
-                if selection_key not in st.session_state.editable_data:
-                    # Load actual values from Excel data, not default zeros
-                    try:
-                        excel_excess_km_charge = float(row_data.get('Excess KM charge (Per KM)', 0)) if pd.notna(row_data.get('Excess KM charge (Per KM)', 0)) else 0.0
-                    except (ValueError, TypeError):
-                        excel_excess_km_charge = 0.0
-                    
-                    try:
-                        excel_estimated_km_per_month = float(row_data.get('Estimated KM (Per Month)', 0)) if pd.notna(row_data.get('Estimated KM (Per Month)', 0)) else 0.0
-                    except (ValueError, TypeError):
-                        excel_estimated_km_per_month = 0.0
-                    
-                    st.session_state.editable_data[selection_key] = {
-                        'excess_km_charge': excel_excess_km_charge,
-                        'estimated_km_per_month': excel_estimated_km_per_month
-                    }
-                
-                # Editable fields - show actual values from Excel or session state
-                excess_km_charge = st.number_input(
+        # Edits made before the file changed can't be saved over the newer version
+        stale_edits = [s for s in selections if st.session_state.editable_data[s]['base_signature'] != fleet.signature]
+        if stale_edits:
+            st.warning(
+                f"Your edits to {', '.join(map(str, stale_edits))} are based on a previous version of the Excel file "
+                "and can't be saved. Deselect and reselect those units to start again from the latest data."
+            )
+        
+        # Create editable input fields section, one table row per selection
+        st.markdown("Adjust the values below to recalculate costs:")
+        
+        edit_frame = pd.DataFrame({
+            first_column: selections,
+            EXCESS_KM_CHARGE: [st.session_state.editable_data[s]['excess_km_charge'] for s in selections],
+            ESTIMATED_KM: [st.session_state.editable_data[s]['estimated_km_per_month'] for s in selections],
+        })
+        edited_frame = st.data_editor(
+            edit_frame,
+            # Rows are positional, so a different selection gets a fresh editor
+            key=f"edits_{edit_state_hash([(s, {}) for s in selections])}",
+            hide_index=True,
+            num_rows="fixed",
+            disabled=[first_column],
+            column_config={
+                EXCESS_KM_CHARGE: st.column_config.NumberColumn(
                     "Excess KM Charge (Per KM)",
-                    value=st.session_state.editable_data[selection_key]['excess_km_charge'],
                     min_value=0.0,
                     step=0.1,
                     format="%.2f",
-                    key=f"excess_km_charge_{selection_key}",
                     help="Current value from Excel file or your last edit"
-                )
-                
-                estimated_km_per_month = st.number_input(
+                ),
+                ESTIMATED_KM: st.column_config.NumberColumn(
                     "Estimated KM (Per Month)",
-                    value=st.session_state.editable_data[selection_key]['estimated_km_per_month'],
                     min_value=0.0,
                     step=1.0,
                     format="%.1f",
-                    key=f"estimated_km_per_month_{selection_key}",
                     help="Current value from Excel file or your last edit"
-                )
-                
-                # Update session state
-                st.session_state.editable_data[selection_key]['excess_km_charge'] = excess_km_charge
-                st.session_state.editable_data[selection_key]['estimated_km_per_month'] = estimated_km_per_month
+                ),
+            },
+        )
         
-        # Calculate and display comparison
-        st.markdown("### 📊 Updated Comparison")
+        # Update session state
+        excess_km_charges = numeric_column(edited_frame, EXCESS_KM_CHARGE)
+        estimated_kms_per_month = numeric_column(edited_frame, ESTIMATED_KM)
+        for i, selection in enumerate(selections):
+            entry = st.session_state.editable_data[selection]
+            values = (float(excess_km_charges[i]), float(estimated_kms_per_month[i]))
+            if values != (entry['excess_km_charge'], entry['estimated_km_per_month']):
+                entry['edited'] = True
+            entry['excess_km_charge'], entry['estimated_km_per_month'] = values
         
-        # Create card-based comparison
-        updated_rows = []
+        timer.lap("inputs")
         
-        # Create columns for cards
-        card_cols = st.columns(len(selected_data))
+        # Price all selected rows in one vectorized pass
+        priced = price_rows(
+            selected_frame,
+            first_column,
+            excess_km_charge=excess_km_charges,
+            estimated_km_per_month=estimated_kms_per_month,
+        )
+        timer.lap("pricing")
         
-        for idx, (name, selection, row_data, original_idx) in enumerate(selected_data):
-            selection_key = f"{selection}_{original_idx}"
-            
-            # Get editable values
-            excess_km_charge = st.session_state.editable_data[selection_key]['excess_km_charge']
-            estimated_km_per_month = st.session_state.editable_data[selection_key]['estimated_km_per_month']
-            
-            # Get existing values with proper type conversion
-            try:
-                kilo_meters_per_month = float(row_data.get('Kilo Meters (Per Month)', 0)) if pd.notna(row_data.get('Kilo Meters (Per Month)', 0)) else 0.0
-            except (ValueError, TypeError):
-                kilo_meters_per_month = 0.0
-                
-            try:
-                rent_cost_over_lease_period = float(row_data.get('Rent Cost (Over Lease Period)', 0)) if pd.notna(row_data.get('Rent Cost (Over Lease Period)', 0)) else 0.0
-            except (ValueError, TypeError):
-                rent_cost_over_lease_period = 0.0
-            
-            try:
-                sticker_cost = float(row_data.get('Sticker Cost', 0)) if pd.notna(row_data.get('Sticker Cost', 0)) else 0.0
-            except (ValueError, TypeError):
-                sticker_cost = 0.0
-            
-            try:
-                insurance_cost = float(row_data.get('Insurance Cost', 0)) if pd.notna(row_data.get('Insurance Cost', 0)) else 0.0
-            except (ValueError, TypeError):
-                insurance_cost = 0.0
-            
-            try:
-                months = float(row_data.get('MONTH', 48)) if pd.notna(row_data.get('MONTH', 48)) else 48.0  # Default to 48 months if not found
-            except (ValueError, TypeError):
-                months = 48.0
-            
-            # Calculate Excess KM Cost (Over the Lease Term) - using the MONTH column value
-            if kilo_meters_per_month == 0:
-                excess_km_cost_over_lease_term = 0.0
-            elif estimated_km_per_month > kilo_meters_per_month:
-                excess_km_cost_over_lease_term = (estimated_km_per_month - kilo_meters_per_month) * excess_km_charge * months
-            else:
-                excess_km_cost_over_lease_term = 0.0
-            
-            # Calculate Total Cost over the Lease Term
-            total_cost_over_lease_term = rent_cost_over_lease_period + excess_km_cost_over_lease_term + sticker_cost + insurance_cost
-            
-            # Calculate Cost per Month
-            cost_per_month = total_cost_over_lease_term / months if months > 0 else 0.0
-            
-            # Calculate Cost Per Kilo Meter - NEW CALCULATION
-            # Check if first column contains 'Prime Mover'
-            first_column_value = str(row_data[first_column]).lower()
-            if 'prime mover' in first_column_value and estimated_km_per_month > 0:
-                cost_per_kilo_meter = cost_per_month / estimated_km_per_month
-            else:
-                cost_per_kilo_meter = 0.0
-            
-            # Store raw values for saving
-            raw_updated_row = row_data.copy()
-            raw_updated_row['Excess KM charge (Per KM)'] = excess_km_charge
-            raw_updated_row['Estimated KM (Per Month)'] = estimated_km_per_month
-            raw_updated_row['Excess KM Cost (Over the Lease Term)'] = excess_km_cost_over_lease_term
-            raw_updated_row['Total Cost over the Lease Term'] = total_cost_over_lease_term
-            raw_updated_row['Cost per Month'] = cost_per_month
-            raw_updated_row['Cost Per Kilo Meter'] = cost_per_kilo_meter  # NEW FIELD
-            updated_rows.append((selection, raw_updated_row))
-            
-            # Display card with fixed height
-            with card_cols[idx]:
-                st.markdown(f"""
-                <div style="
-                    border: 1px solid #e0e0e0;
-                    border-radius: 8px;
-                    padding: 20px;
-                    margin-bottom: 10px;
-                    background-color: #f8f9fa;
-                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                ">
-                    <h4 style="margin-top: 0; color: #333; border-bottom: 2px solid #007bff; padding-bottom: 8px;">
-                        {selection}
-                    </h4>
-                    <div style="flex-grow: 1;">
-                """, unsafe_allow_html=True)
-                
-                # Display all fields from the row
-                for col, value in row_data.items():
-                    if col != first_column:  # Skip the first column as it's already shown in header
-                        # Format the value based on the column
-                        if col in ['Excess KM charge (Per KM)', 'Estimated KM (Per Month)', 'Excess KM Cost (Over the Lease Term)', 'Total Cost over the Lease Term', 'Cost per Month', 'Cost Per Kilo Meter']:
-                            if col == 'Excess KM charge (Per KM)':
-                                formatted_value = f"{excess_km_charge:,.2f}"
-                            elif col == 'Estimated KM (Per Month)':
-                                formatted_value = f"{estimated_km_per_month:,.1f} km"
-                            elif col == 'Excess KM Cost (Over the Lease Term)':
-                                formatted_value = f"{excess_km_cost_over_lease_term:,.2f}"
-                            elif col == 'Total Cost over the Lease Term':
-                                formatted_value = f"{total_cost_over_lease_term:,.2f}"
-                            elif col == 'Cost per Month':
-                                formatted_value = f"{cost_per_month:,.2f}"
-                            elif col == 'Cost Per Kilo Meter':
-                                formatted_value = f"{cost_per_kilo_meter:,.4f}" if cost_per_kilo_meter > 0 else "0.00"
-                        elif col == 'Rent Cost (Over Lease Period)':
-                            formatted_value = f"{rent_cost_over_lease_period:,.2f}"
-                        elif col == 'Kilo Meters (Per Month)':
-                            formatted_value = f"{kilo_meters_per_month:,.0f} km"
-                        elif col in ['Sticker Cost', 'Insurance Cost']:
-                            cost_value = sticker_cost if col == 'Sticker Cost' else insurance_cost
-                            formatted_value = f"{cost_value:,.2f}"
-                        else:
-                            if pd.isna(value):
-                                formatted_value = "-"
-                            else:
-                                formatted_value = str(value)
-                        
-                        # Highlight calculated fields
-                        if col in ['Rent Cost (Over Lease Period)', 'Sticker Cost', 'Insurance Cost', 'Excess KM Cost (Over the Lease Term)', 'Total Cost over the Lease Term', 'Cost per Month', 'Cost Per Kilo Meter']:
-                            st.markdown(f"**{col}:** <span style='color: #007bff; font-weight: bold;'>{formatted_value}</span>", unsafe_allow_html=True)
-                        else:
-                            st.markdown(f"**{col}:** {formatted_value}")
-                
-                # Add Cost Per Kilo Meter if it's not already in the row data
-                if 'Cost Per Kilo Meter' not in row_data.index:
-                    formatted_value = f"{cost_per_kilo_meter:,.4f}" if cost_per_kilo_meter > 0 else "0.00"
-                    st.markdown(f"**Cost Per Kilo Meter:** <span style='color: #007bff; font-weight: bold;'>{formatted_value}</span>", unsafe_allow_html=True)
-                
-                st.markdown("</div></div>", unsafe_allow_html=True)
+        # Calculate and display comparison
+        st.markdown("### 📊 Updated Comparison")
+        
+        # Page through units so the table stays readable and cheap to render
+        pages = page_count(len(selections))
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key="compare_page")
+        page_slice = slice((page - 1) * UNITS_PER_PAGE, page * UNITS_PER_PAGE)
+        st.markdown(
+            comparison_table_html(selected_frame.iloc[page_slice], priced.iloc[page_slice], first_column),
+            unsafe_allow_html=True
+        )
         
         # Highlight calculated fields
         st.markdown("### 🧮 Calculated Values Summary")
-        summary_cols = st.columns(len(selected_data))
+        summary = priced[[EXCESS_KM_COST, TOTAL_COST, COST_PER_MONTH, COST_PER_KM]].copy()
+        summary.index = pd.Index(selections, name=first_column)
+        st.dataframe(summary.style.format({
+            EXCESS_KM_COST: "{:,.2f}",
+            TOTAL_COST: "{:,.2f}",
+            COST_PER_MONTH: "{:,.2f}",
+            COST_PER_KM: lambda value: f"{value:,.4f}" if value > 0 else "0.00",
+        }))
         
-        for idx, (name, selection, row_data, original_idx) in enumerate(selected_data):
-            with summary_cols[idx]:
-                selection_key = f"{selection}_{original_idx}"
-                excess_km_charge = st.session_state.editable_data[selection_key]['excess_km_charge']
-                estimated_km_per_month = st.session_state.editable_data[selection_key]['estimated_km_per_month']
-                
-                # Get existing values with proper type conversion
-                try:
-                    kilo_meters_per_month = float(row_data.get('Kilo Meters (Per Month)', 0)) if pd.notna(row_data.get('Kilo Meters (Per Month)', 0)) else 0.0
-                except (ValueError, TypeError):
-                    kilo_meters_per_month = 0.0
-                    
-                try:
-                    rent_cost_over_lease_period = float(row_data.get('Rent Cost (Over Lease Period)', 0)) if pd.notna(row_data.get('Rent Cost (Over Lease Period)', 0)) else 0.0
-                except (ValueError, TypeError):
-                    rent_cost_over_lease_period = 0.0
-                
-                try:
-                    sticker_cost = float(row_data.get('Sticker Cost', 0)) if pd.notna(row_data.get('Sticker Cost', 0)) else 0.0
-                except (ValueError, TypeError):
-                    sticker_cost = 0.0
-                
-                try:
-                    insurance_cost = float(row_data.get('Insurance Cost', 0)) if pd.notna(row_data.get('Insurance Cost', 0)) else 0.0
-                except (ValueError, TypeError):
-                    insurance_cost = 0.0
-                
-                try:
-                    months = float(row_data.get('MONTH', 48)) if pd.notna(row_data.get('MONTH', 48)) else 48.0
-                except (ValueError, TypeError):
-                    months = 48.0
-                
-                if kilo_meters_per_month == 0:
-                    excess_km_cost_over_lease_term = 0.0
-                elif estimated_km_per_month > kilo_meters_per_month:
-                    excess_km_cost_over_lease_term = (estimated_km_per_month - kilo_meters_per_month) * excess_km_charge * months
-                else:
-                    excess_km_cost_over_lease_term = 0.0
-                
-                total_cost_over_lease_term = rent_cost_over_lease_period + excess_km_cost_over_lease_term + sticker_cost + insurance_cost
-                cost_per_month = total_cost_over_lease_term / months if months > 0 else 0.0
-                
-                # Calculate Cost Per Kilo Meter for summary
-                first_column_value = str(row_data[first_column]).lower()
-                if 'prime mover' in first_column_value and estimated_km_per_month > 0:
-                    cost_per_kilo_meter = cost_per_month / estimated_km_per_month
-                else:
-                    cost_per_kilo_meter = 0.0
-                
-                st.markdown(f"**{selection}**")
-                st.metric("Excess KM Cost (Over the Lease Term)", f"{excess_km_cost_over_lease_term:,.2f}")
-                st.metric("Total Cost over the Lease Term", f"{total_cost_over_lease_term:,.2f}")
-                st.metric("Cost per Month", f"{cost_per_month:,.2f}")
-                st.metric("Cost Per Kilo Meter", f"{cost_per_kilo_meter:,.4f}" if cost_per_kilo_meter > 0 else "0.00")
+        # Only the edited columns of each selected row need to be written out
+        row_updates = [
+            (selection, {col: float(priced.iloc[i][col]) for col in UPDATED_COLUMNS})
+            for i, selection in enumerate(selections)
+        ]
+        
+        timer.lap("render")
         
         # Save and Download buttons
         st.markdown("---")
         col_save, col_download, col_info = st.columns([1, 1, 2])
         
         with col_save:
-            if st.button("💾 Save Changes to Excel", type="primary"):
-                try:
-                    # Read the original Excel file
-                    df_original = pd.read_excel(excel_file_path)
-                    
-                    # Update the dataframe with calculated values
-                    for selection, updated_row in updated_rows:
-                        # Find the row index in original dataframe
-                        row_index = df_original[df_original[first_column] == selection].index[0]
-                        
-                        # Update the specific columns
-                        df_original.loc[row_index, 'Excess KM charge (Per KM)'] = updated_row['Excess KM charge (Per KM)']
-                        df_original.loc[row_index, 'Estimated KM (Per Month)'] = updated_row['Estimated KM (Per Month)']
-                        df_original.loc[row_index, 'Excess KM Cost (Over the Lease Term)'] = updated_row['Excess KM Cost (Over the Lease Term)']
-                        df_original.loc[row_index, 'Total Cost over the Lease Term'] = updated_row['Total Cost over the Lease Term']
-                        df_original.loc[row_index, 'Cost per Month'] = updated_row['Cost per Month']
-                        df_original.loc[row_index, 'Cost Per Kilo Meter'] = updated_row['Cost Per Kilo Meter']  # NEW FIELD
-                    
-                    # Save back to Excel
-                    df_original.to_excel(excel_file_path, index=False)
-                    st.success("✅ Changes saved successfully to Excel file!")
-                    
-                    # Clear session state to force reload of fresh data
-                    st.session_state.editable_data = {}
-                    st.session_state.data_refresh_needed = True
-                    
-                    # Small delay and then rerun to show updated values
-                    import time
-                    time.sleep(0.5)
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"❌ Error saving to Excel: {str(e)}")
+            st.button(
+                "💾 Save Changes to Excel",
+                type="primary",
+                disabled=quote_directory_mode,
+                help="Saving is only available for a single workbook" if quote_directory_mode else None,
+                on_click=perf.timed_call(
+                    "save",
+                    st.session_state.perf_session_id,
+                    rows_loaded,
+                    len(selections),
+                    partial(save_changes, fleet, row_updates),
+                ),
+            )
+            if 'save_message' in st.session_state:
+                kind, message = st.session_state.pop('save_message')
+                if kind == "success":
+                    st.success(message)
+                else:
+                    st.error(message)
         
         with col_download:
             try:
-                # Prepare the updated dataframe for download
-                df_for_download = pd.read_excel(excel_file_path)
-                
-                # Update the dataframe with current calculated values
-                for selection, updated_row in updated_rows:
-                    # Find the row index in dataframe
-                    row_index = df_for_download[df_for_download[first_column] == selection].index[0]
-                    
-                    # Update the specific columns with current values
-                    df_for_download.loc[row_index, 'Excess KM charge (Per KM)'] = updated_row['Excess KM charge (Per KM)']
-                    df_for_download.loc[row_index, 'Estimated KM (Per Month)'] = updated_row['Estimated KM (Per Month)']
-                    df_for_download.loc[row_index, 'Excess KM Cost (Over the Lease Term)'] = updated_row['Excess KM Cost (Over the Lease Term)']
-                    df_for_download.loc[row_index, 'Total Cost over the Lease Term'] = updated_row['Total Cost over the Lease Term']
-                    df_for_download.loc[row_index, 'Cost per Month'] = updated_row['Cost per Month']
-                    df_for_download.loc[row_index, 'Cost Per Kilo Meter'] = updated_row['Cost Per Kilo Meter']  # NEW FIELD
-                
-                # Convert dataframe to Excel bytes
-                from io import BytesIO
-                excel_buffer = BytesIO()
-                df_for_download.to_excel(excel_buffer, index=False, engine='openpyxl')
-                excel_buffer.seek(0)
-                
                 # Create download button
                 st.download_button(
                     label="📥 Download Data",
-                    data=excel_buffer.getvalue(),
-                    file_name=f"updated_{excel_file_path}",
+                    # Generated only when clicked, and reused for an unchanged edit state
+                    data=perf.timed_call(
+                        "download",
+                        st.session_state.perf_session_id,
+                        rows_loaded,
+                        len(selections),
+                        partial(export_workbook, fleet, row_updates),
+                    ),
+                    file_name=f"updated_{os.path.splitext(os.path.basename(os.path.abspath(excel_file_path)))[0]}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     help="Download Excel file with current calculated values"
                 )
@@ -409,9 +314,107 @@ try:
         with col_info:
             st.info("💡 'Save Changes' updates the original file permanently. 'Download Data' gives you a copy with current calculations.")
         
+        timer.lap("actions")
+        
     else:
-        st.info("👆 Please select at least one item from the dropdowns to see the comparison.")
+        st.info("👆 Please select at least one item from the list to see the comparison.")
+    
+    # What-if scenario sweep, computed only while it is switched on
+    st.markdown("---")
+    if st.toggle("📈 What-if scenario sweep", key="show_sweep"):
+        # Plotly is only imported once a chart is actually needed
+        import plotly.graph_objects as go
+        
+        st.markdown("Apply the same Estimated KM and Excess KM charge to every unit and see how monthly cost responds.")
+        
+        km_limit = max(numeric_column(df, KILO_METERS).max(initial=0.0), numeric_column(df, ESTIMATED_KM).max(initial=0.0))
+        km_limit = float(km_limit * 2) if km_limit > 0 else 10000.0
+        
+        sweep_cols = st.columns(3)
+        with sweep_cols[0]:
+            km_range = st.slider("Estimated KM (Per Month)", 0.0, km_limit, (0.0, km_limit), key="sweep_km_range")
+        with sweep_cols[1]:
+            charge_range = st.slider("Excess KM charge (Per KM)", 0.0, 2.0, (0.0, 1.0), step=0.01, key="sweep_charge_range")
+        with sweep_cols[2]:
+            grid_points = st.slider("Grid points per axis", 10, 200, 50, key="sweep_grid_points")
+        
+        km_grid = np.linspace(km_range[0], km_range[1], grid_points)
+        charge_grid = np.linspace(charge_range[0], charge_range[1], grid_points)
+        
+        # Whole fleet in one pass over the grid
+        fleet_cost = sweep_fleet_cost_per_month(df, km_grid, charge_grid)
+        fleet_fig = go.Figure(go.Heatmap(
+            x=km_grid,
+            y=charge_grid,
+            z=fleet_cost.T,
+            colorscale="Blues",
+            colorbar=dict(title="Cost per Month"),
+            hovertemplate="Estimated KM: %{x:,.0f}<br>Excess KM charge: %{y:.2f}<br>Fleet cost per month: %{z:,.2f}<extra></extra>",
+        ))
+        fleet_fig.update_layout(
+            title=f"Fleet cost per month ({len(df)} units)",
+            xaxis_title="Estimated KM (Per Month)",
+            yaxis_title="Excess KM charge (Per KM)",
+        )
+        st.plotly_chart(fleet_fig)
+        
+        if selections:
+            sweep_frame = df.iloc[[fleet.position(selection) for selection in selections]]
+            unit_cost = sweep_cost_per_month(sweep_frame, km_grid, charge_grid)
+            
+            # Cost curves at one charge; crossings are the break-even distances between units
+            curve_charge = charge_range[0]
+            if charge_range[1] > charge_range[0]:
+                curve_charge = st.slider(
+                    "Excess KM charge for break-even curves",
+                    charge_range[0], charge_range[1], (charge_range[0] + charge_range[1]) / 2,
+                    key="sweep_curve_charge"
+                )
+            curve_cost = sweep_cost_per_month(sweep_frame, km_grid, [curve_charge])[:, :, 0]
+            curve_fig = go.Figure([
+                go.Scatter(x=km_grid, y=curve_cost[i], mode="lines", name=str(selection))
+                for i, selection in enumerate(selections)
+            ])
+            curve_fig.update_layout(
+                title=f"Cost per month at {curve_charge:.2f} per excess KM",
+                xaxis_title="Estimated KM (Per Month)",
+                yaxis_title="Cost per Month",
+                legend=dict(orientation="h", yanchor="top", y=-0.2),
+            )
+            st.plotly_chart(curve_fig)
+            
+            if len(selections) > 1:
+                cheapest = unit_cost.argmin(axis=0)
+                names = np.array([str(selection) for selection in selections], dtype=object)
+                cheapest_fig = go.Figure(go.Heatmap(
+                    x=km_grid,
+                    y=charge_grid,
+                    z=cheapest.T,
+                    customdata=names[cheapest.T],
+                    colorscale="Viridis",
+                    showscale=False,
+                    hovertemplate="Estimated KM: %{x:,.0f}<br>Excess KM charge: %{y:.2f}<br>Cheapest: %{customdata}<extra></extra>",
+                ))
+                cheapest_fig.update_layout(
+                    title="Cheapest selected unit",
+                    xaxis_title="Estimated KM (Per Month)",
+                    yaxis_title="Excess KM charge (Per KM)",
+                )
+                st.plotly_chart(cheapest_fig)
+        
+        timer.lap("sweep")
 
 except Exception as e:
     st.error(f"Error reading the Excel file: {str(e)}")
-    st.info("Please make sure your Excel file is properly formatted and not corrupted.")
\ No newline at end of file
+    st.info("Please make sure your Excel file is properly formatted and not corrupted.")
+
+# Recent timings across all sessions, shown only while timing is enabled
+if timer.enabled:
+    with st.expander("⏱️ Performance"):
+        stats = perf.phase_stats()
+        if stats.empty:
+            st.caption("No timings recorded yet.")
+        else:
+            st.dataframe(stats.style.format({'p50 (ms)': "{:,.1f}", 'p95 (ms)': "{:,.1f}"}))
+        st.caption(f"Logging to {perf.log_path()}")
+timer.finish(rows_loaded, len(selections))
\ No newline at end of file
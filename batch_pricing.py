@@ -0,0 +1,139 @@
+"""Price a trailer workbook without starting the dashboard.
+
+Reads the workbook in streaming mode, recomputes the derived cost columns
+batch by batch and writes the result as CSV or Parquet, so memory stays
+bounded by the batch size rather than the size of the sheet.
+
+    python batch_pricing.py trailer.xlsx priced.parquet --batch-size 20000
+"""
+import argparse
+import os
+import sys
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from fleet_data import iter_workbook_batches
+from pricing import COST_PER_KM, COST_PER_MONTH, EXCESS_KM_COST, TOTAL_COST, price_rows
+
+DERIVED_COLUMNS = [EXCESS_KM_COST, TOTAL_COST, COST_PER_MONTH, COST_PER_KM]
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def price_batch(batch, key_column):
+    """Return ``batch`` with the derived cost columns recomputed from the workbook values."""
+    priced = price_rows(batch, key_column)
+    batch = batch.copy()
+    for column in DERIVED_COLUMNS:
+        batch[column] = priced[column]
+    return batch
+
+
+def _normalize_for_parquet(batch):
+    # Cells arrive as plain Python values; store numeric columns as float64 and
+    # everything else as text so every batch shares one schema
+    columns = {}
+    for column in batch.columns:
+        values = batch[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            columns[column] = values.astype(np.float64)
+        else:
+            columns[column] = values.map(str, na_action='ignore')
+    return pd.DataFrame(columns)
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self._handle = open(path, 'w', newline='', encoding='utf-8')
+        self._header = True
+
+    def write(self, batch):
+        batch.to_csv(self._handle, header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        self._handle.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self._path = path
+        self._writer = None
+
+    def write(self, batch):
+        frame = _normalize_for_parquet(batch)
+        if self._writer is None:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            # Text columns that are empty in the first batch would otherwise be typed as null
+            schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            self._writer = pq.ParquetWriter(self._path, schema)
+            table = table.cast(schema)
+        else:
+            try:
+                table = pa.Table.from_pandas(frame, schema=self._writer.schema, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"A column changed type part-way through the sheet ({e}); write CSV instead") from e
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            # A sheet without even a header row still produces a (column-less) file
+            pq.write_table(pa.table({}), self._path)
+            return
+        self._writer.close()
+
+
+def open_writer(path, output_format):
+    if output_format == 'parquet':
+        return _ParquetWriter(path)
+    return _CsvWriter(path)
+
+
+def price_workbook(input_path, output_path, output_format=None, batch_size=DEFAULT_BATCH_SIZE, sheet_name=None):
+    """Stream ``input_path`` through the pricing engine into ``output_path``; returns the row count."""
+    if output_format is None:
+        output_format = 'parquet' if output_path.lower().endswith('.parquet') else 'csv'
+
+    writer = open_writer(output_path, output_format)
+    rows = 0
+    try:
+        for batch in iter_workbook_batches(input_path, batch_size, sheet_name=sheet_name):
+            writer.write(price_batch(batch, batch.columns[0]))
+            rows += len(batch)
+    finally:
+        writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute lease cost columns for a trailer workbook.")
+    parser.add_argument('input', help="workbook to price, e.g. trailer.xlsx")
+    parser.add_argument('output', help="output file (.csv or .parquet)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="output format (default: from the output file extension)")
+    parser.add_argument('--sheet', help="worksheet to read (default: the first sheet)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f"rows priced per batch (default: {DEFAULT_BATCH_SIZE})")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error(f"Excel file '{args.input}' not found")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    try:
+        rows = price_workbook(args.input, args.output, args.format, args.batch_size, args.sheet)
+    except (KeyError, ValueError, OSError, zipfile.BadZipFile) as e:
+        print(f"Error pricing '{args.input}': {e}", file=sys.stderr)
+        return 1
+    print(f"Priced {rows} rows from '{args.input}' into '{args.output}'")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
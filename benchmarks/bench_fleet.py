@@ -0,0 +1,200 @@
+"""Benchmark the dashboard's data paths on synthetic fleet workbooks.
+
+Generates trailer-style workbooks of the requested sizes (cached under
+benchmarks/data/), then times loading, key lookups, cost calculation,
+saving and download serialization separately by calling the same
+functions app.py uses. Results are written as JSON so runs from different
+versions can be compared:
+
+    python benchmarks/bench_fleet.py --rows 1000 100000
+    python benchmarks/bench_fleet.py --rows 1000 --baseline benchmarks/results/old.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import openpyxl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fleet_data  # noqa: E402
+from pricing import (  # noqa: E402
+    COST_PER_KM, COST_PER_MONTH, ESTIMATED_KM, EXCESS_KM_CHARGE, EXCESS_KM_COST, INSURANCE_COST,
+    KILO_METERS, MONTHS, RENT_COST, STICKER_COST, TOTAL_COST, UPDATED_COLUMNS, price_rows,
+)
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+DEFAULT_ROWS = [1000, 100000, 1000000]
+
+# Same column layout as trailer.xlsx
+COLUMNS = [
+    'Vehicle', 'Provided By', 'RENT', RENT_COST, MONTHS, 'Rental Clause', 'Available from',
+    KILO_METERS, EXCESS_KM_CHARGE, ESTIMATED_KM, EXCESS_KM_COST, 'SLR STICKER', STICKER_COST,
+    'Insurance', INSURANCE_COST, 'Maintaince', 'Road side assistance', 'Credit Terms',
+    'Return Policy', 'Profit Share', TOTAL_COST, COST_PER_MONTH, COST_PER_KM,
+]
+
+VENDORS = ['SCULLY', 'EURO COLD', 'FTE', 'VAWDREY']
+
+# Number of key lookups timed per workbook
+LOOKUPS = 10000
+
+# Rows edited by the save and download benchmarks, like a three-way comparison
+EDITED_ROWS = 3
+
+
+def generate_workbook(path, rows, seed=0):
+    """Write a synthetic fleet workbook with ``rows`` units, about a third of them prime movers."""
+    rng = np.random.default_rng(seed)
+    prime_mover = rng.random(rows) < 0.35
+    months = rng.choice([36, 48, 60], size=rows)
+    weekly_rent = rng.uniform(800, 2500, size=rows).round(2)
+    allowance = np.where(prime_mover, rng.choice([0, 12500, 15000, 60000], size=rows), rng.choice([0, 20000], size=rows))
+    excess_charge = rng.choice([0.0, 0.1, 0.15, 0.25], size=rows)
+    estimated_km = (allowance * rng.uniform(0.8, 1.3, size=rows)).round(0)
+    sticker = rng.choice([0, 4000], size=rows)
+    insurance = rng.uniform(0, 50000, size=rows).round(5)
+    vendors = rng.choice(VENDORS, size=rows)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(COLUMNS)
+    for i in range(rows):
+        vehicle = f"Prime Mover (Synthetic {i})" if prime_mover[i] else f"Trailer (Synthetic {i})"
+        rent_cost = float(weekly_rent[i]) * 52 / 12 * int(months[i])
+        sheet.append([
+            f"{vehicle} {vendors[i]}", str(vendors[i]), f"{weekly_rent[i]:,.2f} Per Week", round(rent_cost, 2),
+            int(months[i]), 'No Clause', 'No Clause', float(allowance[i]), float(excess_charge[i]),
+            float(estimated_km[i]), None, 'Included', int(sticker[i]), 'No Clause for Insurance',
+            float(insurance[i]), 'Fully Maintained', 'No Clause', '59 Days From Date Of Invoice',
+            f"Fixed for {months[i]} Month", 'No Clause for Profit Sharing', None, None, None,
+        ])
+    workbook.save(path)
+
+
+def synthetic_workbook(rows):
+    path = os.path.join(DATA_DIR, f"fleet_{rows}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"  generating {rows} rows ...", flush=True)
+        generate_workbook(path, rows)
+    return path
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def remove_sidecar(path):
+    sidecar = fleet_data.sidecar_path(path)
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+
+
+def bench_workbook(source, rows):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Work on a copy so saves and sidecars never touch the cached workbook
+        path = os.path.join(workdir, 'trailer.xlsx')
+        shutil.copyfile(source, path)
+
+        fleet_data.clear_cache()
+        remove_sidecar(path)
+        results['load_cold_xlsx'], fleet = timed(fleet_data.load_fleet, path)
+        fleet_data.clear_cache()
+        results['load_sidecar'], fleet = timed(fleet_data.load_fleet, path)
+        results['load_cached'], fleet = timed(fleet_data.load_fleet, path)
+
+        rng = np.random.default_rng(1)
+        keys = fleet.frame[fleet.key_column].to_numpy()[rng.integers(0, len(fleet.frame), size=LOOKUPS)].tolist()
+        elapsed, _ = timed(lambda: [fleet.position(key) for key in keys])
+        results['lookup_per_key'] = elapsed / LOOKUPS
+
+        results['price_all_rows'], priced = timed(price_rows, fleet.frame, fleet.key_column)
+
+        edited = rng.choice(len(fleet.frame), size=min(EDITED_ROWS, len(fleet.frame)), replace=False)
+        updates = [
+            (fleet.frame[fleet.key_column].iloc[position], {col: float(priced.iloc[position][col]) + 1.0 for col in UPDATED_COLUMNS})
+            for position in edited
+        ]
+        results['download_serialize'], _ = timed(fleet_data.export_workbook, fleet, updates)
+        results['download_memoized'], _ = timed(fleet_data.export_workbook, fleet, updates)
+        results['save'], _ = timed(fleet_data.save_updates, path, fleet.key_column, updates, fleet.signature)
+
+    fleet_data.clear_cache()
+    return {'rows': rows, 'seconds': results}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print each phase's time relative to the same phase in ``baseline``."""
+    previous = {run['rows']: run['seconds'] for run in baseline['runs']}
+    for run in results['runs']:
+        if run['rows'] not in previous:
+            continue
+        print(f"\n{run['rows']} rows vs {baseline.get('revision') or 'baseline'}:")
+        for phase, seconds in run['seconds'].items():
+            before = previous[run['rows']].get(phase)
+            if before:
+                print(f"  {phase:<20} {seconds:>12.6f}s  {seconds / before:>6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time load, lookup, pricing, save and download on synthetic workbooks.")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="workbook sizes to benchmark")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<revision>-<time>.json)")
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    revision = git_revision()
+    results = {
+        'revision': revision,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': [],
+    }
+    for rows in args.rows:
+        print(f"{rows} rows", flush=True)
+        run = bench_workbook(synthetic_workbook(rows), rows)
+        for phase, seconds in run['seconds'].items():
+            print(f"  {phase:<20} {seconds:>12.6f}s")
+        results['runs'].append(run)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{revision or 'local'}-{stamp}.json")
+    with open(output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            compare(results, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
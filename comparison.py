@@ -0,0 +1,78 @@
+import html
+
+import pandas as pd
+
+from pricing import (
+    COST_PER_KM, COST_PER_MONTH, ESTIMATED_KM, EXCESS_KM_CHARGE, EXCESS_KM_COST, INSURANCE_COST,
+    KILO_METERS, RENT_COST, STICKER_COST, TOTAL_COST,
+)
+
+# Number of units shown side by side on one page of the comparison table
+UNITS_PER_PAGE = 4
+
+# Fields shown in the highlight colour
+HIGHLIGHTED_COLUMNS = [RENT_COST, STICKER_COST, INSURANCE_COST, EXCESS_KM_COST, TOTAL_COST, COST_PER_MONTH, COST_PER_KM]
+
+# Fields displayed from the priced values rather than the raw workbook cell
+_PRICED_FORMATS = {
+    EXCESS_KM_CHARGE: "{:,.2f}",
+    ESTIMATED_KM: "{:,.1f} km",
+    EXCESS_KM_COST: "{:,.2f}",
+    TOTAL_COST: "{:,.2f}",
+    COST_PER_MONTH: "{:,.2f}",
+    RENT_COST: "{:,.2f}",
+    KILO_METERS: "{:,.0f} km",
+    STICKER_COST: "{:,.2f}",
+    INSURANCE_COST: "{:,.2f}",
+}
+
+_TABLE_STYLE = "border-collapse: collapse; width: 100%; table-layout: fixed;"
+_CELL_STYLE = "border: 1px solid #e0e0e0; padding: 6px 10px; vertical-align: top; word-wrap: break-word;"
+_HEADER_STYLE = _CELL_STYLE + " background-color: #f8f9fa; color: #333; border-bottom: 2px solid #007bff;"
+_HIGHLIGHT_STYLE = "color: #007bff; font-weight: bold;"
+
+
+def page_count(n_units, page_size=UNITS_PER_PAGE):
+    return max(1, -(-n_units // page_size))
+
+
+def format_field(column, value, priced_row):
+    """Format one field of a unit for display, using the priced value where there is one."""
+    if column == COST_PER_KM:
+        cost_per_km = priced_row[COST_PER_KM]
+        return f"{cost_per_km:,.4f}" if cost_per_km > 0 else "0.00"
+    if column in _PRICED_FORMATS:
+        return _PRICED_FORMATS[column].format(priced_row[column])
+    if pd.isna(value):
+        return "-"
+    return str(value)
+
+
+def comparison_table_html(rows, priced, key_column):
+    """Render the selected units as one HTML table with a column per unit.
+
+    ``rows`` holds the workbook rows of the units to show and ``priced`` the
+    matching output of ``pricing.price_rows``, in the same order.
+    """
+    columns = [col for col in rows.columns if col != key_column]
+    if COST_PER_KM not in columns:
+        columns.append(COST_PER_KM)
+
+    keys = rows[key_column].tolist()
+    header = "".join(f'<th style="{_HEADER_STYLE}">{html.escape(str(key))}</th>' for key in keys)
+    lines = [
+        f'<table style="{_TABLE_STYLE}">',
+        f'<thead><tr><th style="{_HEADER_STYLE}"></th>{header}</tr></thead>',
+        '<tbody>',
+    ]
+    for col in columns:
+        values = rows[col].tolist() if col in rows.columns else [None] * len(rows)
+        cells = []
+        for position, value in enumerate(values):
+            text = html.escape(format_field(col, value, priced.iloc[position]))
+            if col in HIGHLIGHTED_COLUMNS:
+                text = f'<span style="{_HIGHLIGHT_STYLE}">{text}</span>'
+            cells.append(f'<td style="{_CELL_STYLE}">{text}</td>')
+        lines.append(f'<tr><th style="{_CELL_STYLE} text-align: left;">{html.escape(str(col))}</th>{"".join(cells)}</tr>')
+    lines.append('</tbody></table>')
+    return "\n".join(lines)
@@ -0,0 +1,498 @@
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from io import BytesIO
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+
+from unit_search import UnitSearch
+from vendor_quotes import directory_signature, read_quote_directory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Workbook the dashboard reads, relative to the working directory; a
+# directory of vendor quote workbooks is read as one merged dataset
+WORKBOOK_PATH = os.environ.get('TRAILER_WORKBOOK', 'trailer.xlsx')
+
+# Seconds between checks of a watched workbook for changes
+WATCH_INTERVAL = 2.0
+
+# Schema metadata key recording which workbook version a sidecar was built from
+SIDECAR_SOURCE_KEY = b'trailer.source_signature'
+
+
+class SaveConflictError(Exception):
+    """Raised when the workbook on disk is not the version the edits were made against."""
+
+
+@dataclass(frozen=True)
+class FleetData:
+    """A parsed workbook together with the file version it was read from.
+
+    One instance per workbook version is shared by every session, so the
+    frame is stored with compact dtypes and must never be modified.
+    ``version`` increases each time a new dataset is published. ``index``
+    maps each value of the key (first) column to the position of the first
+    row holding it; ``duplicates`` lists keys found on more than one row.
+    ``search`` is the type-ahead index over the keys.
+    """
+    path: str
+    signature: tuple
+    frame: pd.DataFrame
+    key_column: str
+    index: dict
+    duplicates: tuple
+    version: int
+    search: UnitSearch
+
+    def position(self, key):
+        """Return the row position for ``key``, raising ``KeyError`` if it is unknown."""
+        try:
+            return self.index[key]
+        except KeyError:
+            raise KeyError(f"'{key}' not found in column '{self.key_column}'") from None
+
+    def row(self, key):
+        return self.frame.iloc[self.position(key)]
+
+
+# Number of generated download workbooks kept in memory
+EXPORT_CACHE_SIZE = 16
+
+# Parsed workbooks keyed on (absolute path, mtime, size), shared by every rerun
+_cache = {}
+_cache_lock = threading.Lock()
+
+# One lock per workbook so concurrent first loads wait for a single parse
+_load_locks = {}
+
+# Most recently published dataset per workbook, swapped in by the watcher
+_latest = {}
+
+# Background watcher threads keyed on absolute workbook path
+_watchers = {}
+
+_log = logging.getLogger(__name__)
+
+# Published dataset versions, increasing across all workbooks in the process
+_versions = itertools.count(1)
+
+# Serialized download workbooks keyed on (path, signature, edit state hash)
+_export_cache = OrderedDict()
+_export_lock = threading.Lock()
+
+
+def file_signature(path):
+    """Return the (mtime_ns, size) pair used to tell workbook versions apart.
+
+    For a quote directory this covers every workbook inside it.
+    """
+    if os.path.isdir(path):
+        return directory_signature(path)
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def sidecar_path(path):
+    """Return the Arrow IPC sidecar path kept next to the workbook at ``path``."""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{name}.arrow")
+
+
+def _encode_signature(signature):
+    return ":".join(str(part) for part in signature).encode()
+
+
+def _read_sidecar(path, signature):
+    """Memory-map the sidecar for ``path`` if it was built from this workbook version."""
+    sidecar = sidecar_path(path)
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        with pa.memory_map(sidecar, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            if metadata.get(SIDECAR_SOURCE_KEY) != _encode_signature(signature):
+                return None
+            return reader.read_all().to_pandas()
+    except (OSError, pa.ArrowException):
+        # A truncated or foreign file is treated like a missing sidecar
+        return None
+
+
+def _write_sidecar(path, signature, frame):
+    """Write ``frame`` to the sidecar for ``path``; failures only cost the next cold start."""
+    sidecar = sidecar_path(path)
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    except pa.ArrowException:
+        # Columns mixing numbers and text have no Arrow type; keep using the workbook
+        return
+    metadata = dict(table.schema.metadata or {})
+    metadata[SIDECAR_SOURCE_KEY] = _encode_signature(signature)
+    table = table.replace_schema_metadata(metadata)
+
+    try:
+        # A unique name per writer, as sessions, the watcher and the warm-up can write at once
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(sidecar), suffix='.arrow.tmp')
+        os.close(handle)
+    except OSError:
+        return
+    try:
+        with pa.OSFile(temp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, sidecar)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def read_workbook(path, signature):
+    """Read the workbook through its columnar sidecar, rebuilding the sidecar when stale."""
+    frame = _read_sidecar(path, signature)
+    if frame is None:
+        frame = read_quote_directory(path) if os.path.isdir(path) else pd.read_excel(path)
+        _write_sidecar(path, signature, frame)
+    return frame
+
+
+def _is_text(values):
+    return values.dtype == object or isinstance(values.dtype, pd.StringDtype)
+
+
+def compact_frame(frame, key_column):
+    """Return ``frame`` with smaller dtypes for sharing between sessions.
+
+    The key column and text columns where most values repeat become
+    categoricals, integers are downcast, and floats are downcast to
+    float32 only when that keeps every value exact, so costs are not
+    rounded.
+    """
+    columns = {}
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_float_dtype(values):
+            downcast = values.astype(np.float32)
+            if np.array_equal(downcast.to_numpy(dtype=np.float64), values.to_numpy(dtype=np.float64), equal_nan=True):
+                values = downcast
+        elif pd.api.types.is_integer_dtype(values):
+            values = pd.to_numeric(values, downcast='integer')
+        elif _is_text(values) and (column == key_column or values.nunique() <= len(values) // 2):
+            values = values.astype('category')
+        columns[column] = values
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def _editable(values):
+    # Widen compact dtypes so any edited value fits
+    if values.dtype == np.float64:
+        return values
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(np.float64)
+    return values.astype(object)
+
+
+def build_key_index(frame, key_column):
+    """Map each key to its first row position and collect keys that appear more than once."""
+    index = {}
+    duplicates = []
+    for position, key in enumerate(frame[key_column].tolist()):
+        if key in index:
+            if key not in duplicates:
+                duplicates.append(key)
+        else:
+            index[key] = position
+    return index, tuple(duplicates)
+
+
+def load_fleet(path):
+    """Load the workbook at ``path``, parsing it only when the file has changed.
+
+    The returned frame is shared between callers and must be treated as
+    read-only; copy it before making changes.
+    """
+    abs_path = os.path.abspath(path)
+    signature = file_signature(abs_path)
+    with _cache_lock:
+        cached = _cache.get((abs_path,) + signature)
+    if cached is not None:
+        return cached
+
+    with _load_lock(abs_path):
+        # Another thread (e.g. the server warm-up or a save) may have published it meanwhile
+        with _cache_lock:
+            signature = file_signature(abs_path)
+            cached = _cache.get((abs_path,) + signature)
+            if cached is None:
+                # Taken with the signature, so a dataset read from an older file gets an older version
+                version = next(_versions)
+        if cached is not None:
+            return cached
+        frame = read_workbook(abs_path, signature)
+        return _publish(abs_path, signature, compact_frame(frame, frame.columns[0]), version)
+
+
+def _load_lock(path):
+    with _cache_lock:
+        return _load_locks.setdefault(path, threading.Lock())
+
+
+def _publish(path, signature, frame, version):
+    """Index ``frame`` and make it the shared dataset for ``path`` at ``signature``.
+
+    If a newer version was published while ``frame`` was being prepared,
+    that one is kept and returned instead.
+    """
+    key_column = frame.columns[0]
+    index, duplicates = build_key_index(frame, key_column)
+    data = FleetData(
+        path=path,
+        signature=signature,
+        frame=frame,
+        key_column=key_column,
+        index=index,
+        duplicates=duplicates,
+        version=version,
+        search=UnitSearch(frame[key_column].tolist()),
+    )
+
+    with _cache_lock:
+        latest = _latest.get(path)
+        if latest is not None and latest.version > version:
+            return latest
+        # Drop stale versions of this file so old frames can be freed
+        for key in [key for key in _cache if key[0] == path]:
+            del _cache[key]
+        _cache[(path,) + tuple(signature)] = data
+        _latest[path] = data
+    return data
+
+
+def current_fleet(path):
+    """Return the latest published dataset for ``path`` without checking the file.
+
+    Only the very first call for a workbook loads it; after that a watcher
+    started with ``start_watcher`` keeps the published dataset up to date.
+    """
+    abs_path = os.path.abspath(path)
+    with _cache_lock:
+        data = _latest.get(abs_path)
+    return data if data is not None else load_fleet(abs_path)
+
+
+def _watch(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            signature = file_signature(path)
+            with _cache_lock:
+                latest = _latest.get(path)
+            if latest is None or latest.signature != signature:
+                data = load_fleet(path)
+                _log.info("Reloaded '%s' as version %s (%d rows)", path, data.version, len(data.frame))
+        except Exception:
+            # A half-written or briefly missing file is picked up on a later check
+            _log.warning("Could not reload '%s'", path, exc_info=True)
+
+
+def start_watcher(path, interval=WATCH_INTERVAL):
+    """Start (once per workbook) a daemon thread that reloads ``path`` whenever it changes."""
+    abs_path = os.path.abspath(path)
+    with _cache_lock:
+        if abs_path not in _watchers:
+            thread = threading.Thread(target=_watch, args=(abs_path, interval), name='fleet-watcher', daemon=True)
+            _watchers[abs_path] = thread
+            thread.start()
+
+
+def save_and_publish(fleet, updates, expected_signature):
+    """Save ``updates`` into the workbook of ``fleet`` and publish the result to every session.
+
+    The saved values are published without parsing the workbook again. The
+    workbook's load lock is held throughout, so the watcher waits for the
+    published dataset instead of reloading the saved file itself. Raises
+    ``SaveConflictError`` like ``save_updates``.
+    """
+    with _load_lock(fleet.path):
+        signature = save_updates(fleet.path, fleet.key_column, updates, expected_signature)
+        frame = compact_frame(apply_updates(fleet, updates), fleet.key_column)
+        _write_sidecar(fleet.path, signature, frame)
+        with _cache_lock:
+            version = next(_versions)
+        return _publish(fleet.path, tuple(signature), frame, version)
+
+
+def edit_state_hash(updates):
+    """Hash a sequence of ``(key, {column: value})`` edits into a stable cache key."""
+    digest = hashlib.sha256()
+    for key, values in updates:
+        digest.update(repr((key, sorted(values.items()))).encode())
+    return digest.hexdigest()
+
+
+def apply_updates(fleet, updates):
+    """Return a copy of the fleet frame with each ``(key, {column: value})`` edit applied to the row for ``key``."""
+    frame = fleet.frame.copy()
+    for column in {column for _, values in updates for column in values}:
+        if column in frame.columns:
+            frame[column] = _editable(frame[column])
+    for key, values in updates:
+        row_index = frame.index[fleet.position(key)]
+        for column, value in values.items():
+            frame.loc[row_index, column] = value
+    return frame
+
+
+def export_workbook(fleet, updates):
+    """Serialize ``fleet`` with ``updates`` applied to XLSX bytes, memoized per edit state."""
+    cache_key = (fleet.path, fleet.signature, edit_state_hash(updates))
+    with _export_lock:
+        if cache_key in _export_cache:
+            _export_cache.move_to_end(cache_key)
+            return _export_cache[cache_key]
+
+    frame = apply_updates(fleet, updates)
+    buffer = BytesIO()
+    frame.to_excel(buffer, index=False, engine='openpyxl')
+    data = buffer.getvalue()
+
+    with _export_lock:
+        _export_cache[cache_key] = data
+        while len(_export_cache) > EXPORT_CACHE_SIZE:
+            _export_cache.popitem(last=False)
+    return data
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive cross-process lock for the workbook at ``path``."""
+    directory, name = os.path.split(os.path.abspath(path))
+    with open(os.path.join(directory, f".{name}.lock"), 'a+') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def save_updates(path, key_column, updates, expected_signature):
+    """Write ``(key, {column: value})`` edits into the workbook at ``path`` in place.
+
+    Only the edited cells are touched, so the rest of the sheet keeps its
+    values and formatting. The new file is written next to the original and
+    renamed over it while holding the workbook lock. Raises
+    ``SaveConflictError`` if the file on disk no longer matches
+    ``expected_signature``. Returns the signature of the saved file.
+    """
+    path = os.path.abspath(path)
+    with file_lock(path):
+        if file_signature(path) != tuple(expected_signature):
+            raise SaveConflictError(
+                f"'{os.path.basename(path)}' was changed by someone else after it was loaded"
+            )
+
+        workbook = openpyxl.load_workbook(path)
+        # pd.read_excel reads the first sheet, so edits go there as well
+        sheet = workbook.worksheets[0]
+        header = {cell.value: cell.column for cell in sheet[1] if cell.value is not None}
+        if key_column not in header:
+            raise KeyError(f"Column '{key_column}' not found in '{os.path.basename(path)}'")
+
+        # Map each edited key to the first sheet row holding it, as the frame lookups do
+        wanted = {key for key, _ in updates}
+        key_rows = {}
+        key_cells = sheet.iter_rows(min_row=2, min_col=header[key_column], max_col=header[key_column], values_only=True)
+        for row_number, (value,) in enumerate(key_cells, start=2):
+            if value in wanted and value not in key_rows:
+                key_rows[value] = row_number
+                if len(key_rows) == len(wanted):
+                    break
+
+        for key, values in updates:
+            if key not in key_rows:
+                raise KeyError(f"'{key}' not found in column '{key_column}'")
+            for column, value in values.items():
+                if column not in header:
+                    # New derived columns are appended after the existing ones
+                    header[column] = sheet.max_column + 1
+                    sheet.cell(row=1, column=header[column], value=column)
+                sheet.cell(row=key_rows[key], column=header[column], value=value)
+
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.xlsx.tmp')
+        os.close(handle)
+        try:
+            workbook.save(temp_path)
+            # mkstemp creates the file as 0600; keep the workbook's original permissions
+            shutil.copymode(path, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return file_signature(path)
+
+
+def iter_workbook_batches(path, batch_size, sheet_name=None):
+    """Stream a worksheet as DataFrames of at most ``batch_size`` rows.
+
+    The workbook is opened in openpyxl read-only mode, so memory use depends
+    on ``batch_size`` rather than on the size of the sheet. The first row is
+    the header; fully empty rows are skipped. A sheet with a header and no
+    data rows yields one empty frame, so callers still see its columns.
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Match the names pd.read_excel gives to blank header cells
+        columns = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+
+        batch = []
+        yielded = False
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            row = row[:len(columns)]
+            batch.append(row + (None,) * (len(columns) - len(row)))
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=columns)
+                yielded = True
+                batch = []
+        if batch or not yielded:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _latest.clear()
+    with _export_lock:
+        _export_cache.clear()
@@ -0,0 +1,134 @@
+"""Opt-in timing of dashboard reruns.
+
+Set ``TRAILER_PERF_LOG`` to a file path to enable it. Each rerun is then
+appended to that file as one JSON line with the time spent in each phase,
+and the most recent records are kept in memory for the in-app panel.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+LOG_PATH_ENV = 'TRAILER_PERF_LOG'
+
+# Records kept in memory for the percentile panel, across all sessions
+RECENT_RECORDS = 500
+
+_recent = deque(maxlen=RECENT_RECORDS)
+_write_lock = threading.Lock()
+
+_log = logging.getLogger(__name__)
+
+# Log files that could not be written, so each is warned about once
+_unwritable = set()
+
+
+def log_path():
+    return os.environ.get(LOG_PATH_ENV) or None
+
+
+def enabled():
+    return log_path() is not None
+
+
+def _publish(record):
+    path = log_path()
+    with _write_lock:
+        _recent.append(record)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as handle:
+                handle.write(json.dumps(record) + "\n")
+        except OSError:
+            # Timing must never break a rerun; the in-app panel still has the records
+            if path not in _unwritable:
+                _unwritable.add(path)
+                _log.warning("Could not write perf log '%s'", path, exc_info=True)
+
+
+class RerunTimer:
+    """Split one rerun into named phases with ``lap`` and publish them with ``finish``.
+
+    Each ``lap(name)`` charges the time since the previous lap (or since the
+    timer was created) to ``name``. When timing is disabled every method is
+    a no-op.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.enabled = enabled()
+        self.phases = {}
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def finish(self, rows, selections):
+        if not self.enabled:
+            return
+        _publish({
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'session_id': self.session_id,
+            'rows': rows,
+            'selections': selections,
+            'phases': self.phases,
+            'total': time.perf_counter() - self._start,
+        })
+
+
+def timed_call(phase, session_id, rows, selections, func):
+    """Wrap ``func`` so each call is published as a record holding the single ``phase``.
+
+    Used for work that happens outside a rerun, such as the download
+    callable Streamlit runs on its own thread.
+    """
+    if not enabled():
+        return func
+
+    def wrapper():
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        _publish({
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'session_id': session_id,
+            'rows': rows,
+            'selections': selections,
+            'phases': {phase: elapsed},
+            'total': elapsed,
+        })
+        return result
+
+    return wrapper
+
+
+def phase_stats():
+    """Return p50/p95 milliseconds and sample counts per phase over the recent records."""
+    with _write_lock:
+        records = list(_recent)
+    samples = {}
+    for record in records:
+        for phase, seconds in record['phases'].items():
+            samples.setdefault(phase, []).append(seconds)
+        if len(record['phases']) > 1:
+            samples.setdefault('total', []).append(record['total'])
+
+    stats = {
+        phase: {
+            'p50 (ms)': float(np.percentile(values, 50)) * 1000,
+            'p95 (ms)': float(np.percentile(values, 95)) * 1000,
+            'samples': len(values),
+        }
+        for phase, values in samples.items()
+    }
+    return pd.DataFrame.from_dict(stats, orient='index')
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# Input columns
+KILO_METERS = 'Kilo Meters (Per Month)'
+RENT_COST = 'Rent Cost (Over Lease Period)'
+STICKER_COST = 'Sticker Cost'
+INSURANCE_COST = 'Insurance Cost'
+MONTHS = 'MONTH'
+EXCESS_KM_CHARGE = 'Excess KM charge (Per KM)'
+ESTIMATED_KM = 'Estimated KM (Per Month)'
+
+# Derived columns
+EXCESS_KM_COST = 'Excess KM Cost (Over the Lease Term)'
+TOTAL_COST = 'Total Cost over the Lease Term'
+COST_PER_MONTH = 'Cost per Month'
+COST_PER_KM = 'Cost Per Kilo Meter'
+
+DEFAULT_MONTHS = 48.0
+
+# Columns written back to the workbook after an edit
+UPDATED_COLUMNS = [EXCESS_KM_CHARGE, ESTIMATED_KM, EXCESS_KM_COST, TOTAL_COST, COST_PER_MONTH, COST_PER_KM]
+
+
+def numeric_column(frame, column, default=0.0):
+    """Return ``frame[column]`` as float64, with missing or non-numeric values set to ``default``."""
+    if column not in frame.columns:
+        return np.full(len(frame), default, dtype=np.float64)
+    values = frame[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(values), default, values)
+
+
+def is_prime_mover(keys):
+    """Vectorized test for rows whose key mentions a prime mover."""
+    return pd.Series(keys).astype(str).str.lower().str.contains('prime mover', regex=False).to_numpy()
+
+
+def price_rows(frame, key_column, excess_km_charge=None, estimated_km_per_month=None):
+    """Compute the lease cost columns for every row of ``frame`` in one pass.
+
+    ``excess_km_charge`` and ``estimated_km_per_month`` override the values
+    stored in the workbook; each may be a scalar or an array aligned with
+    ``frame``. Returns a frame on the same index holding the cleaned inputs
+    and the four derived cost columns.
+    """
+    kilo_meters = numeric_column(frame, KILO_METERS)
+    rent_cost = numeric_column(frame, RENT_COST)
+    sticker_cost = numeric_column(frame, STICKER_COST)
+    insurance_cost = numeric_column(frame, INSURANCE_COST)
+    months = numeric_column(frame, MONTHS, default=DEFAULT_MONTHS)
+
+    if excess_km_charge is None:
+        excess_km_charge = numeric_column(frame, EXCESS_KM_CHARGE)
+    if estimated_km_per_month is None:
+        estimated_km_per_month = numeric_column(frame, ESTIMATED_KM)
+    excess_km_charge = np.broadcast_to(np.asarray(excess_km_charge, dtype=np.float64), len(frame))
+    estimated_km_per_month = np.broadcast_to(np.asarray(estimated_km_per_month, dtype=np.float64), len(frame))
+
+    # Excess KM is only charged when the lease has a KM allowance and it is exceeded
+    over_allowance = (kilo_meters != 0) & (estimated_km_per_month > kilo_meters)
+    excess_km_cost = np.where(
+        over_allowance,
+        (estimated_km_per_month - kilo_meters) * excess_km_charge * months,
+        0.0,
+    )
+
+    total_cost = rent_cost + excess_km_cost + sticker_cost + insurance_cost
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost_per_month = np.where(months > 0, total_cost / months, 0.0)
+        # Cost per KM only applies to prime movers with an estimated distance
+        per_km = is_prime_mover(frame[key_column]) & (estimated_km_per_month > 0)
+        cost_per_km = np.where(per_km, cost_per_month / estimated_km_per_month, 0.0)
+
+    return pd.DataFrame({
+        KILO_METERS: kilo_meters,
+        RENT_COST: rent_cost,
+        STICKER_COST: sticker_cost,
+        INSURANCE_COST: insurance_cost,
+        MONTHS: months,
+        EXCESS_KM_CHARGE: excess_km_charge,
+        ESTIMATED_KM: estimated_km_per_month,
+        EXCESS_KM_COST: excess_km_cost,
+        TOTAL_COST: total_cost,
+        COST_PER_MONTH: cost_per_month,
+        COST_PER_KM: cost_per_km,
+    }, index=frame.index)
+
+
+def sweep_cost_per_month(frame, estimated_km_grid, excess_km_charge_grid):
+    """Cost per month of every row at every grid point, shape ``(rows, len(km grid), len(charge grid))``.
+
+    The grid values replace each row's Estimated KM and Excess KM charge.
+    Memory grows with rows x grid points, so use this for a handful of units
+    and ``sweep_fleet_cost_per_month`` for the whole fleet.
+    """
+    kilo_meters = numeric_column(frame, KILO_METERS)[:, None, None]
+    months = numeric_column(frame, MONTHS, default=DEFAULT_MONTHS)[:, None, None]
+    base_cost = (
+        numeric_column(frame, RENT_COST) + numeric_column(frame, STICKER_COST) + numeric_column(frame, INSURANCE_COST)
+    )[:, None, None]
+    estimated_km = np.asarray(estimated_km_grid, dtype=np.float64)[None, :, None]
+    excess_km_charge = np.asarray(excess_km_charge_grid, dtype=np.float64)[None, None, :]
+
+    over_allowance = (kilo_meters != 0) & (estimated_km > kilo_meters)
+    excess_km_cost = np.where(over_allowance, (estimated_km - kilo_meters) * excess_km_charge * months, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(months > 0, (base_cost + excess_km_cost) / months, 0.0)
+
+
+def sweep_fleet_cost_per_month(frame, estimated_km_grid, excess_km_charge_grid):
+    """Fleet-wide sum of cost per month at every grid point, shape ``(len(km grid), len(charge grid))``.
+
+    Over the lease term a row costs ``base / months + max(km - allowance, 0) * charge``
+    per month, so the fleet sum splits into a constant plus ``charge`` times a
+    function of the estimated KM alone. That function is evaluated for the
+    whole grid from sorted allowances and cumulative sums, so the cost is
+    O(rows log rows + grid points) instead of rows x grid points.
+    """
+    kilo_meters = numeric_column(frame, KILO_METERS)
+    months = numeric_column(frame, MONTHS, default=DEFAULT_MONTHS)
+    base_cost = numeric_column(frame, RENT_COST) + numeric_column(frame, STICKER_COST) + numeric_column(frame, INSURANCE_COST)
+    estimated_km = np.asarray(estimated_km_grid, dtype=np.float64)
+    excess_km_charge = np.asarray(excess_km_charge_grid, dtype=np.float64)
+
+    priced = months > 0
+    fixed_per_month = (base_cost[priced] / months[priced]).sum()
+
+    # Rows without a KM allowance never pay excess KM
+    allowances = np.sort(kilo_meters[priced & (kilo_meters != 0)])
+    cumulative = np.concatenate([[0.0], np.cumsum(allowances)])
+    below = np.searchsorted(allowances, estimated_km, side='left')
+    excess_km = below * estimated_km - cumulative[below]
+
+    return fixed_per_month + np.outer(excess_km, excess_km_charge)
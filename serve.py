@@ -0,0 +1,47 @@
+"""Start the dashboard with its data already loaded.
+
+Runs ``streamlit run app.py`` inside this process after starting a
+background warm-up that loads, compacts and indexes the workbook, starts
+watching it for changes and imports plotly, so the first visitor after a
+deploy gets the same latency as everyone else. Any Streamlit options are
+passed through:
+
+    python serve.py --server.port 8501
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+
+from fleet_data import WORKBOOK_PATH, load_fleet, start_watcher
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+
+def warm_up(path):
+    start = time.perf_counter()
+    try:
+        fleet = load_fleet(path)
+    except Exception as e:
+        # The dashboard reports a missing or unreadable workbook itself
+        print(f"Warm-up skipped: could not load '{path}': {e}", file=sys.stderr)
+        return
+    print(f"Warm-up loaded {len(fleet.frame)} rows from '{path}' in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    start_watcher(path)
+
+    # Only the what-if sweep needs plotly; import it while nobody is waiting
+    importlib.import_module('plotly.graph_objects')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    threading.Thread(target=warm_up, args=(WORKBOOK_PATH,), name='fleet-warm-up', daemon=True).start()
+
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', APP_PATH] + argv
+    sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import bisect
+import heapq
+import re
+
+from pricing import is_prime_mover
+
+PRIME_MOVER = 'Prime Mover'
+TRAILER = 'Trailer'
+VEHICLE_TYPES = [PRIME_MOVER, TRAILER]
+
+# Number of matches sent to the browser for one search
+DEFAULT_LIMIT = 25
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+
+class UnitSearch:
+    """Token index over the key column for type-ahead unit search.
+
+    Every word of a key is indexed, the last word of a query matches as a
+    prefix and the others as whole words, so a query touches only the
+    posting lists of its own tokens instead of the whole fleet.
+    """
+
+    def __init__(self, keys):
+        # Duplicated keys are searchable once, at their first row
+        self.keys = list(dict.fromkeys(keys))
+        self.types = [PRIME_MOVER if prime else TRAILER for prime in is_prime_mover(self.keys)]
+        self._type_of = dict(zip(self.keys, self.types))
+        self._by_type = {vehicle_type: [] for vehicle_type in VEHICLE_TYPES}
+        for position, vehicle_type in enumerate(self.types):
+            self._by_type[vehicle_type].append(position)
+
+        postings = {}
+        for position, key in enumerate(self.keys):
+            for token in set(tokenize(key)):
+                postings.setdefault(token, []).append(position)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+    def _prefix_positions(self, prefix):
+        positions = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            positions.update(self._postings[token])
+        return positions
+
+    def search(self, query, vehicle_type=None, limit=DEFAULT_LIMIT):
+        """Return ``(keys, total)``: up to ``limit`` keys matching ``query`` and the number of matches.
+
+        Keys starting with the query come first; results are otherwise in
+        workbook order, Prime Movers before Trailers.
+        """
+        types = VEHICLE_TYPES if vehicle_type is None else [vehicle_type]
+        tokens = tokenize(query)
+        if not tokens:
+            # Nothing typed: the first units of each type, without touching the rest
+            ranked = []
+            for group in types:
+                ranked.extend(self._by_type[group][:limit - len(ranked)])
+            return [self.keys[position] for position in ranked], sum(len(self._by_type[group]) for group in types)
+
+        matches = self._prefix_positions(tokens[-1])
+        for token in tokens[:-1]:
+            matches &= set(self._postings.get(token, ()))
+            if not matches:
+                break
+        if vehicle_type is not None:
+            matches = {position for position in matches if self.types[position] == vehicle_type}
+
+        lowered = str(query).strip().lower()
+        ranked = heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda position: (
+                not str(self.keys[position]).lower().startswith(lowered),
+                VEHICLE_TYPES.index(self.types[position]),
+                position,
+            ),
+        )
+        return [self.keys[position] for position in ranked], len(matches)
+
+    def vehicle_type(self, key):
+        return self._type_of[key]
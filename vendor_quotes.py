@@ -0,0 +1,123 @@
+"""Merge a directory of vendor quote workbooks into one dataset.
+
+Every sheet of every workbook in the directory is parsed in its own
+worker process, its column names are normalized, and the results are
+concatenated with a ``Source`` column naming the workbook and sheet each
+row came from.
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
+import pandas as pd
+
+from pricing import (
+    COST_PER_KM, COST_PER_MONTH, ESTIMATED_KM, EXCESS_KM_CHARGE, EXCESS_KM_COST, INSURANCE_COST,
+    KILO_METERS, MONTHS, RENT_COST, STICKER_COST, TOTAL_COST,
+)
+
+SOURCE_COLUMN = 'Source'
+
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm')
+
+# Column names the pricing engine relies on; vendor spellings are mapped onto these
+CANONICAL_COLUMNS = [
+    KILO_METERS, RENT_COST, STICKER_COST, INSURANCE_COST, MONTHS, EXCESS_KM_CHARGE, ESTIMATED_KM,
+    EXCESS_KM_COST, TOTAL_COST, COST_PER_MONTH, COST_PER_KM,
+]
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def _column_token(name):
+    # "Excess KM Charge (per km)" and "excess km charge per KM" compare equal
+    return _NON_WORD.sub(" ", str(name).lower()).strip()
+
+
+_CANONICAL_BY_TOKEN = {_column_token(name): name for name in CANONICAL_COLUMNS}
+
+
+def normalize_column_name(name):
+    name = " ".join(str(name).split())
+    return _CANONICAL_BY_TOKEN.get(_column_token(name), name)
+
+
+def list_workbooks(directory):
+    """Return the quote workbooks in ``directory``, skipping hidden and Excel lock files."""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith(('.', '~$'))
+    )
+
+
+def directory_signature(directory):
+    """Version of a quote directory: name, mtime and size of every workbook in it."""
+    signature = []
+    for path in list_workbooks(directory):
+        stat = os.stat(path)
+        signature.append((os.path.basename(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def discover_sheets(directory):
+    """Return ``(path, sheet name)`` for every sheet of every workbook in ``directory``."""
+    sheets = []
+    for path in list_workbooks(directory):
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            sheets.extend((path, name) for name in workbook.sheetnames)
+        finally:
+            workbook.close()
+    return sheets
+
+
+def parse_sheet(path, sheet_name):
+    """Parse one sheet and normalize it; runs in a worker process."""
+    frame = pd.read_excel(path, sheet_name=sheet_name)
+    frame = frame.dropna(axis='index', how='all')
+    frame.columns = [normalize_column_name(name) for name in frame.columns]
+    return frame
+
+
+def _pool_context():
+    # The dashboard process runs server threads, which forking copies unsafely
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def read_quote_directory(directory, max_workers=None):
+    """Parse every sheet under ``directory`` in parallel and merge them into one frame.
+
+    The first column of each sheet is the unit key. It is renamed to the
+    first sheet's key column name and suffixed with the source, so equal
+    unit names from different vendors stay distinct.
+    """
+    sheets = discover_sheets(directory)
+    if not sheets:
+        raise ValueError(f"No workbooks found in '{directory}'")
+
+    if len(sheets) == 1:
+        frames = [parse_sheet(*sheets[0])]
+    else:
+        workers = min(len(sheets), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            frames = list(pool.map(parse_sheet, *zip(*sheets)))
+
+    parts = []
+    key_column = None
+    for (path, sheet_name), frame in zip(sheets, frames):
+        if frame.empty or len(frame.columns) == 0:
+            continue
+        if key_column is None:
+            key_column = frame.columns[0]
+        source = f"{os.path.basename(path)}:{sheet_name}"
+        frame = frame.rename(columns={frame.columns[0]: key_column})
+        frame[key_column] = frame[key_column].astype(str) + f" [{source}]"
+        frame.insert(1, SOURCE_COLUMN, source)
+        parts.append(frame)
+    if not parts:
+        raise ValueError(f"No rows found in the workbooks in '{directory}'")
+    return pd.concat(parts, ignore_index=True, sort=False)